@@ -1,31 +1,97 @@
 import streamlit as st
 import asyncio
-import aiohttp
 import logging
+import os
+import log_config
 from llms_api_client import CodeGenerationAPI
-import dotenv, io, os
+from code_generation import LANGUAGES, MODELS, generate_code_async, request_key
+from response_store import SessionResults
+from service_client import GenerationServiceClient
 
-dotenv.load_dotenv()
-# Get api_key
-api_key = os.getenv("API_KEY_HUGGINGFACE")
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Streamlit перезапускает этот скрипт на каждое действие пользователя, поэтому
+# тяжёлые модули (aiohttp, dotenv) импортируются лениво, а клиент API и
+# логирование создаются один раз на процесс через st.cache_resource.
 logger = logging.getLogger('streamlit_app')
 
-# Инициализация состояния сессии
-if 'params' not in st.session_state:
-    st.session_state.params = {
-        "max_tokens": 500,
-        "temperature": 0.7,
-        "top_p": 0.95  # оставляем дефолтное значение 0.95
-    }
+# Если задан адрес generation_service.py, приложение работает как тонкий
+# клиент сервиса, иначе генерирует код в своём процессе
+SERVICE_URL = os.getenv("GENERATION_SERVICE_URL")
+
+CONTAINER_CSS = """
+        <style>
+        .stContainer {
+            border: 1px solid #ddd;
+            border-radius: 10px;
+            padding: 20px;
+            margin: 10px 0;
+        }
+        </style>
+        """
+
+
+@st.cache_resource
+def setup_logging():
+    """Настройка логирования (один раз на процесс), см. log_config.py"""
+    log_config.setup_logging()
+
+
+@st.cache_resource
+def get_upstream_api():
+    """Клиент моделей HuggingFace (один раз на процесс)"""
+    import dotenv
+    dotenv.load_dotenv()
+    return CodeGenerationAPI(api_key=os.getenv("API_KEY_HUGGINGFACE"))
+
+
+@st.cache_resource
+def get_api():
+    """Инициализация API (один раз на процесс)"""
+    api = get_upstream_api()
+    # Общий с другими процессами кэш ответов и лимит запросов (shared_store.py)
+    cache_path = os.getenv("GENERATION_CACHE_PATH")
+    if cache_path:
+        from shared_cache import wrap_with_shared_cache
+        api = wrap_with_shared_cache(api, cache_path)
+    return api
+
+
+@st.cache_resource
+def get_budget():
+    """Общий бюджет параллельных запросов для обычной и предварительной генерации"""
+    from speculative import ConcurrencyBudget
+    return ConcurrencyBudget(limit=int(os.getenv("GENERATION_CONCURRENCY", "8")))
+
+
+@st.cache_resource
+def get_speculator():
+    """Фоновая предварительная генерация (см. speculative.py)"""
+    from shared_cache import wrap_with_shared_cache
+    from speculative import SpeculativeGenerator
+    # Результаты хранятся недолго: они нужны только следующей отправке формы,
+    # которая забирает их один раз. Без GENERATION_CACHE_PATH кэш лежит во
+    # временном каталоге.
+    api = wrap_with_shared_cache(
+        get_upstream_api(),
+        response_ttl_s=float(os.getenv("SPECULATIVE_RESULT_TTL_S", "300"))
+    )
+    return SpeculativeGenerator(api, get_budget())
+
+
+def init_session_state():
+    # Инициализация состояния сессии
+    if 'params' not in st.session_state:
+        st.session_state.params = {
+            "max_tokens": 500,
+            "temperature": 0.7,
+            "top_p": 0.95  # оставляем дефолтное значение 0.95
+        }
 
-if 'prompt' not in st.session_state:
-    st.session_state.prompt = ''
+    if 'prompt' not in st.session_state:
+        st.session_state.prompt = ''
+
+    # Результаты последней генерации (response_store.py)
+    if 'results' not in st.session_state:
+        st.session_state.results = SessionResults()
 
 
 def update_params():
@@ -36,105 +102,84 @@ def update_params():
     }
     st.session_state.prompt = st.session_state.form_prompt
 
-# Add this class before main()
-class PromptFormatter:
-    LANGUAGE_TEMPLATES = {
-        "python": """Write Python code for the following task.
-Requirements:
-- Use Pythonic conventions
-- Format Markdown
-- Include comments for complex logic
-- Handle edge cases
-- Use type hints where appropriate
-
-Task description:
-{prompt}
-
-Please provide only the code without explanation:""",
-        
-        "javascript": """Write JavaScript code for the following task.
-Requirements:
-- Use modern ES6+ syntax
-- Format Markdown
-- Follow JavaScript best practices
-- Include error handling
-- Add JSDoc comments for functions
-
-Task description:
-{prompt}
-
-Please provide only the code without explanation:""",
-        
-        "cpp": """Write C++ code for the following task.
-Requirements:
-- Follow modern C++ conventions
-- Format Markdown
-- Include proper error handling
-- Use appropriate STL containers
-- Add comments for complex logic
-
-Task description:
-{prompt}
-
-Please provide only the code without explanation:"""
-    }
+def session_id() -> str:
+    if 'session_id' not in st.session_state:
+        import uuid
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.session_id
+
+def schedule_speculation():
+    # Запрос изменился (поле потеряло фокус или нажат Ctrl+Enter): код для
+    # основной модели с текущими параметрами сразу начинает генерироваться в кэш
+    prompt = st.session_state.form_prompt
+    if prompt.strip():
+        get_speculator().schedule(session_id(), prompt, st.session_state.params)
+
+def prompt_input(on_change=None):
+    # Большое поле для ввода запроса
+    st.text_area(
+        "Введите ваш запрос для генерации кода:",
+        value=st.session_state.prompt,
+        height=200,
+        key="form_prompt",
+        on_change=on_change
+    )
+
+def render_results(results):
+    # Создаем табы для языков
+    lang_tabs = st.tabs(["Python", "JavaScript", "C++"])
     
-    @staticmethod
-    def format_prompt(prompt: str, language: str) -> str:
-        """Format the prompt for specific programming language."""
-        template = PromptFormatter.LANGUAGE_TEMPLATES.get(
-            language, 
-            "Write code in {language} for the following task:\n{prompt}"
-        )
-        return template.format(prompt=prompt, language=language)
-
-async def generate_code_async(session: aiohttp.ClientSession, api: CodeGenerationAPI, 
-                            prompt: str, model: str, language: str, params: dict):
-    logger.info(f"Generating code: language={language}, model={model}")
-    try:
-        # Format the prompt according to language
-        formatted_prompt = PromptFormatter.format_prompt(prompt, language)
-        logger.debug(f"Formatted prompt for {language}:\n{formatted_prompt}")
-        
-        response = await api.generate_code_async(
-            session, 
-            prompt=formatted_prompt, 
-            model=model, 
-            language=language, 
-            **params
-        )
-        logger.debug(f"Response status: {response.status}")
-        return response
-    except Exception as e:
-        logger.error(f"Error in generate_code_async: {str(e)}", exc_info=True)
-        raise
+    # Отображаем результаты в табах
+    for idx, tab in enumerate(lang_tabs):
+        with tab:
+            # Создаем две колонки для моделей
+            col1, col2 = st.columns(2)
+            
+            # Qwen результат
+            with col1:
+                st.subheader("Qwen")
+                result = results[idx * 2]
+                if result.status:
+                    st.markdown(result.generated_text)
+                else:
+                    st.error(f"Ошибка: {result.error}")
+            
+            # StarCoder результат
+            with col2:
+                st.subheader("StarCoder")
+                result = results[idx * 2 + 1]
+                if result.status:
+                    st.markdown(result.generated_text)
+                else:
+                    st.error(f"Ошибка: {result.error}")
 
 def main():
     st.set_page_config(layout="wide", page_title="AI Code Generation")
+    setup_logging()
+    init_session_state()
     
     st.title("Генерация кода с помощью ИИ")
     
+    # Предварительная генерация работает через общий кэш, поэтому только
+    # в режиме генерации внутри процесса
+    speculative = not SERVICE_URL and st.checkbox(
+        "Предварительная генерация",
+        key="speculative",
+        help="Начинать генерацию для основной модели, пока вы редактируете запрос"
+    )
+    
     # Создаем контейнер с рамкой
     with st.container():
-        st.markdown("""
-        <style>
-        .stContainer {
-            border: 1px solid #ddd;
-            border-radius: 10px;
-            padding: 20px;
-            margin: 10px 0;
-        }
-        </style>
-        """, unsafe_allow_html=True)
+        st.markdown(CONTAINER_CSS, unsafe_allow_html=True)
+        
+        # Виджеты внутри формы не сообщают об изменениях до отправки, поэтому
+        # для предварительной генерации поле запроса выносится из формы
+        if speculative:
+            prompt_input(on_change=schedule_speculation)
         
         with st.form(key="params_form"):
-            # Большое поле для ввода запроса
-            st.text_area(
-                "Введите ваш запрос для генерации кода:",
-                value=st.session_state.prompt,
-                height=200,
-                key="form_prompt"
-            )
+            if not speculative:
+                prompt_input()
             
             # Центрированные ползунки
             col1, col2, col3, col4, col5 = st.columns([4, 1, 2, 1, 4])
@@ -171,23 +216,30 @@ def main():
                     on_click=update_params
                 )
     
-    # Инициализация API
-    api = CodeGenerationAPI(api_key=api_key)
-    
     # Генерация кода после отправки формы
     if submit_button and st.session_state.prompt:
         with st.spinner("Генерируем код..."):
-            languages = ["python", "javascript", "cpp"]
-            models = ["qwen", "starcoder"]
-            
-            # Создаем табы для языков
-            lang_tabs = st.tabs(["Python", "JavaScript", "C++"])
+            speculative = st.session_state.get("speculative", False) and not SERVICE_URL
+            api = None if SERVICE_URL else get_api()
+            key = request_key(st.session_state.prompt, st.session_state.params)
+            if speculative:
+                get_speculator().settle(session_id(), keep_key=key)
+                api = get_speculator().foreground_api(api)
             
             async def generate_all():
+                import aiohttp
                 async with aiohttp.ClientSession() as session:
+                    if SERVICE_URL:
+                        return await GenerationServiceClient(SERVICE_URL).generate_batch_async(
+                            session,
+                            st.session_state.prompt,
+                            LANGUAGES,
+                            MODELS,
+                            st.session_state.params
+                        )
                     tasks = []
-                    for lang in languages:
-                        for model in models:
+                    for lang in LANGUAGES:
+                        for model in MODELS:
                             tasks.append(generate_code_async(
                                 session,
                                 api,
@@ -199,34 +251,19 @@ def main():
                     return await asyncio.gather(*tasks)
             
             try:
-                results = asyncio.run(generate_all())
-                
-                # Отображаем результаты в табах
-                for idx, tab in enumerate(lang_tabs):
-                    with tab:
-                        # Создаем две колонки для моделей
-                        col1, col2 = st.columns(2)
-                        
-                        # Qwen результат
-                        with col1:
-                            st.subheader("Qwen")
-                            result = results[idx * 2]
-                            if result.status:
-                                st.markdown(result.generated_text)
-                            else:
-                                st.error(f"Ошибка: {result.error}")
-                        
-                        # StarCoder результат
-                        with col2:
-                            st.subheader("StarCoder")
-                            result = results[idx * 2 + 1]
-                            if result.status:
-                                st.markdown(result.generated_text)
-                            else:
-                                st.error(f"Ошибка: {result.error}")
-                            
+                # Обычный запрос вытесняет предварительную генерацию, если ей
+                # не хватает общего бюджета параллельных запросов
+                with get_budget().foreground(slots=len(LANGUAGES) * len(MODELS), keep_key=key):
+                    results = asyncio.run(generate_all())
+                # Новые результаты заменяют предыдущие, старые освобождаются
+                st.session_state.results.put(key, results)
             except Exception as e:
                 st.error(f"Ошибка при генерации: {str(e)}")
+    
+    # Результаты последней генерации хранятся в сессии и переживают rerun
+    results = st.session_state.results.current
+    if results:
+        render_results(results)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,13 +1,11 @@
 import streamlit as st
-from huggingface_hub import InferenceClient
 import ast
-import dotenv, os
+import os
 
-# Настройка страницы на широкий формат
-st.set_page_config(layout="wide", page_title="AI Code Completion", page_icon="🤖")
-
-# Добавление CSS для улучшения внешнего вида
-st.markdown("""
+# CSS для улучшения внешнего вида. Streamlit удаляет элементы, не выведенные
+# в очередном rerun, поэтому стиль выводится каждый раз, но строка собирается
+# один раз при импорте.
+PAGE_CSS = """
     <style>
         .stTextArea textarea {
             font-family: 'Courier New', Courier, monospace;
@@ -30,10 +28,33 @@ st.markdown("""
             color: #856404;
         }
     </style>
-""", unsafe_allow_html=True)
+"""
 
+# Примеры кода
+EXAMPLE_TEMPLATES = {
+    "Function Template": '''def calculate_sum(a, b):
+    [...]
+    return result''',
+    
+    "Class Template": '''class DataProcessor:
+    def __init__(self, data):
+        self.data = data
+    
+    def process(self):
+        [...]''',
+    
+    "Loop Template": '''for item in items:
+    <...>'''
+}
+
+@st.cache_resource
 def init_client():
-    """Инициализация клиента Hugging Face"""
+    """Инициализация клиента Hugging Face (один раз на процесс)"""
+    # huggingface_hub и dotenv импортируются лениво: скрипт перезапускается
+    # на каждое движение слайдера, а клиент нужен только при генерации
+    import dotenv
+    from huggingface_hub import InferenceClient
+    dotenv.load_dotenv()
     api_key = os.getenv("API_KEY_HUGGINGFACE")
     return InferenceClient(api_key=api_key)
 
@@ -71,6 +92,10 @@ def complete_code(client, incomplete_code, max_tokens, temperature):
         return None
 
 def main():
+    # Настройка страницы на широкий формат
+    st.set_page_config(layout="wide", page_title="AI Code Completion", page_icon="🤖")
+    st.markdown(PAGE_CSS, unsafe_allow_html=True)
+    
     # Заголовок с описанием
     st.title("AI Code Completion Tool")
     st.markdown("""
@@ -78,10 +103,6 @@ def main():
         `[...]` or `<...>` placeholders where you want the AI to fill in the code.
     """)
     
-    # Инициализация клиента при первом запуске
-    if 'client' not in st.session_state:
-        st.session_state.client = init_client()
-    
     # Создаем две колонки: основную для кода и боковую для параметров
     main_col, sidebar = st.columns([3, 1])
     
@@ -109,34 +130,18 @@ def main():
         
         # Примеры кода
         st.subheader("Code Templates")
-        example_templates = {
-            "Function Template": '''def calculate_sum(a, b):
-    [...]
-    return result''',
-            
-            "Class Template": '''class DataProcessor:
-    def __init__(self, data):
-        self.data = data
-    
-    def process(self):
-        [...]''',
-            
-            "Loop Template": '''for item in items:
-    <...>'''
-        }
-        
         selected_template = st.selectbox(
             "Select a template",
-            list(example_templates.keys())
+            list(EXAMPLE_TEMPLATES.keys())
         )
         
         if st.button("Use Template"):
-            st.session_state.current_code = example_templates[selected_template]
+            st.session_state.current_code = EXAMPLE_TEMPLATES[selected_template]
     
     with main_col:
         # Ввод кода с увеличенной высотой
         if 'current_code' not in st.session_state:
-            st.session_state.current_code = example_templates["Function Template"]
+            st.session_state.current_code = EXAMPLE_TEMPLATES["Function Template"]
             
         incomplete_code = st.text_area(
             "Your code:",
@@ -158,7 +163,7 @@ def main():
                     
                     with st.spinner("🔄 Generating completion..."):
                         completed = complete_code(
-                            st.session_state.client,
+                            init_client(),
                             incomplete_code,
                             max_tokens,
                             temperature
@@ -180,4 +185,4 @@ def main():
                 st.experimental_rerun()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,110 @@
+# code_generation.py
+from typing import TYPE_CHECKING
+import logging
+import time
+
+from llms_api_client import CodeGenerationAPI, ModelResponse
+from log_config import log_body, new_request_id
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = logging.getLogger('code_generation')
+
+LANGUAGES = ["python", "javascript", "cpp"]
+MODELS = ["qwen", "starcoder"]
+DEFAULT_PARAMS = {
+    "max_tokens": 500,
+    "temperature": 0.7,
+    "top_p": 0.95
+}
+
+
+def request_key(prompt: str, params: dict) -> tuple:
+    """Identity of one submit: the prompt plus its generation parameters."""
+    return prompt, tuple(sorted(params.items()))
+
+
+class PromptFormatter:
+    LANGUAGE_TEMPLATES = {
+        "python": """Write Python code for the following task.
+Requirements:
+- Use Pythonic conventions
+- Format Markdown
+- Include comments for complex logic
+- Handle edge cases
+- Use type hints where appropriate
+
+Task description:
+{prompt}
+
+Please provide only the code without explanation:""",
+
+        "javascript": """Write JavaScript code for the following task.
+Requirements:
+- Use modern ES6+ syntax
+- Format Markdown
+- Follow JavaScript best practices
+- Include error handling
+- Add JSDoc comments for functions
+
+Task description:
+{prompt}
+
+Please provide only the code without explanation:""",
+
+        "cpp": """Write C++ code for the following task.
+Requirements:
+- Follow modern C++ conventions
+- Format Markdown
+- Include proper error handling
+- Use appropriate STL containers
+- Add comments for complex logic
+
+Task description:
+{prompt}
+
+Please provide only the code without explanation:"""
+    }
+
+    @staticmethod
+    def format_prompt(prompt: str, language: str) -> str:
+        """Format the prompt for specific programming language."""
+        template = PromptFormatter.LANGUAGE_TEMPLATES.get(
+            language,
+            "Write code in {language} for the following task:\n{prompt}"
+        )
+        return template.format(prompt=prompt, language=language)
+
+async def generate_code_async(session: "aiohttp.ClientSession", api: CodeGenerationAPI,
+                            prompt: str, model: str, language: str, params: dict) -> ModelResponse:
+    # Each call runs in its own task, so the request id set here tags only
+    # this call's records and links them to its timing line below.
+    new_request_id()
+    logger.info("Generating code: language=%s, model=%s", language, model,
+                extra={"language": language, "model": model})
+    start = time.perf_counter()
+    try:
+        # Format the prompt according to language
+        formatted_prompt = PromptFormatter.format_prompt(prompt, language)
+        log_body(logger, "Formatted prompt", formatted_prompt, language=language, model=model)
+
+        response = await api.generate_code_async(
+            session,
+            prompt=formatted_prompt,
+            model=model,
+            language=language,
+            **params
+        )
+        log_body(logger, "Generated text", response.generated_text, language=language, model=model)
+        logger.info("Generation finished: status=%s", response.status, extra={
+            "language": language,
+            "model": model,
+            "status": response.status,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        })
+        return response
+    except Exception as e:
+        logger.error("Error in generate_code_async: %s", e, exc_info=True,
+                     extra={"elapsed_ms": round((time.perf_counter() - start) * 1000, 1)})
+        raise
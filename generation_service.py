@@ -0,0 +1,378 @@
+# generation_service.py
+"""Async HTTP/JSON service around CodeGenerationAPI and PromptFormatter.
+
+Endpoints:
+    POST /generate         {"prompt", "language", "model", "params"} -> one result
+    POST /generate/batch   {"prompt", "languages", "models", "params"} -> all results
+    POST /generate/stream  same body as /generate/batch, answered as Server-Sent
+                           Events: one "result" event per language/model as it
+                           completes, then a "done" event
+    GET  /health
+    GET  /metrics
+
+Every generation goes through one bounded queue drained by a fixed number of
+workers. A request whose generations do not all fit in the queue is rejected
+with 503 and a Retry-After header instead of piling up behind it.
+
+Run:
+    python generation_service.py --port 8080 --concurrency 8 --queue-size 64
+    python generation_service.py --mock     # canned responses, no API key needed
+    python generation_service.py --workers 4 --store /tmp/cache.sqlite3
+
+With ``--workers N`` the service forks N processes listening on the same port
+(SO_REUSEPORT). They share the response cache, in-flight table and per-backend
+rate limit through shared_store.SharedStore, so scaling out neither repeats
+upstream calls nor multiplies the request rate seen by the backend. Metrics
+are per worker and carry its pid.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+import aiohttp
+from aiohttp import web
+
+from code_generation import DEFAULT_PARAMS, LANGUAGES, MODELS, generate_code_async
+from shared_cache import SharedCacheAPI, wrap_with_shared_cache
+from shared_store import default_store_path
+
+logger = logging.getLogger('generation_service')
+
+# name -> (type, min, max); top_p must stay below 1.0 for the HuggingFace API
+PARAM_RANGES = {
+    "max_tokens": (int, 1, 2048),
+    "temperature": (float, 0.01, 2.0),
+    "top_p": (float, 0.01, 0.99),
+}
+
+
+class ServiceMetrics:
+    """In-process counters exposed on /metrics"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.requests: Dict[str, int] = {}
+        self.rejected = 0
+        self.in_flight = 0
+        self.generations: Dict[str, Dict[str, float]] = {}
+
+    def count_request(self, endpoint: str):
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def record_generation(self, model: str, language: str, ok: bool, elapsed_ms: float):
+        stats = self.generations.setdefault(f"{model}/{language}", {
+            "ok": 0, "error": 0, "latency_ms_sum": 0.0, "latency_ms_max": 0.0
+        })
+        stats["ok" if ok else "error"] += 1
+        stats["latency_ms_sum"] = round(stats["latency_ms_sum"] + elapsed_ms, 3)
+        stats["latency_ms_max"] = round(max(stats["latency_ms_max"], elapsed_ms), 3)
+
+    def snapshot(self, queue_depth: int, queue_size: int, concurrency: int) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "in_flight": self.in_flight,
+            "queue_depth": queue_depth,
+            "queue_size": queue_size,
+            "concurrency": concurrency,
+            "generations": self.generations,
+        }
+
+
+class GenerationService:
+    """Bounded job queue plus the worker tasks that drain it"""
+
+    def __init__(self, api, concurrency: int = 8, queue_size: int = 64):
+        self.api = api
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.metrics = ServiceMetrics()
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self, app: web.Application):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self.session = aiohttp.ClientSession()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        logger.info("Generation service started: concurrency=%d, queue_size=%d",
+                    self.concurrency, self.queue_size)
+
+    async def stop(self, app: web.Application):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        if self.session is not None:
+            await self.session.close()
+
+    def submit(self, prompt: str, jobs: List[Tuple[str, str]], params: dict) -> List[asyncio.Future]:
+        """Enqueue (language, model) jobs all-or-nothing; raise 503 if they do not fit."""
+        if len(jobs) > self.queue_size:
+            raise _bad_request(f"Request fans out to {len(jobs)} generations, limit is {self.queue_size}")
+        if self.queue_size - self._queue.qsize() < len(jobs):
+            self.metrics.rejected += 1
+            raise web.HTTPServiceUnavailable(
+                text=json.dumps({"error": "Generation queue is full, retry later"}),
+                content_type="application/json",
+                headers={"Retry-After": "1"},
+            )
+        loop = asyncio.get_running_loop()
+        futures = []
+        for language, model in jobs:
+            future = loop.create_future()
+            self._queue.put_nowait((future, prompt, language, model, params))
+            futures.append(future)
+        return futures
+
+    async def _worker(self):
+        while True:
+            future, prompt, language, model, params = await self._queue.get()
+            try:
+                # The client may have gone away while the job was queued
+                if future.cancelled():
+                    continue
+                self.metrics.in_flight += 1
+                start = time.perf_counter()
+                try:
+                    response = await generate_code_async(self.session, self.api, prompt, model, language, params)
+                except Exception as e:
+                    self.metrics.record_generation(model, language, False, (time.perf_counter() - start) * 1000)
+                    # A result rather than an exception: streamed results arrive in
+                    # completion order, so each one must name its (language, model)
+                    if not future.done():
+                        future.set_result(error_to_dict(language, model, f"Error generating code: {e}"))
+                else:
+                    self.metrics.record_generation(model, language, response.status,
+                                                   (time.perf_counter() - start) * 1000)
+                    if not future.done():
+                        future.set_result(response_to_dict(language, model, response))
+                finally:
+                    self.metrics.in_flight -= 1
+            finally:
+                self._queue.task_done()
+
+
+def response_to_dict(language: str, model: str, response) -> Dict[str, Any]:
+    return {
+        "language": language,
+        "model": model,
+        "status": response.status,
+        "generated_text": response.generated_text,
+        "error": response.error,
+        "cached": response.cached,
+    }
+
+
+def error_to_dict(language: str, model: str, error: str) -> Dict[str, Any]:
+    return {
+        "language": language,
+        "model": model,
+        "status": False,
+        "generated_text": "",
+        "error": error,
+        "cached": False,
+    }
+
+
+def _bad_request(message: str) -> web.HTTPBadRequest:
+    return web.HTTPBadRequest(text=json.dumps({"error": message}), content_type="application/json")
+
+
+async def _read_request(request: web.Request, batch: bool) -> Tuple[str, List[Tuple[str, str]], dict]:
+    """Validate a request body and return (prompt, [(language, model)], params)."""
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise _bad_request("Request body must be JSON")
+    if not isinstance(body, dict):
+        raise _bad_request("Request body must be a JSON object")
+
+    prompt = body.get("prompt")
+    if not isinstance(prompt, str) or not prompt.strip():
+        raise _bad_request("'prompt' must be a non-empty string")
+
+    if batch:
+        languages = body.get("languages", LANGUAGES)
+        models = body.get("models", MODELS)
+    else:
+        languages = [body.get("language", "python")]
+        models = [body.get("model", "qwen")]
+    if not isinstance(languages, list) or not languages or not all(isinstance(l, str) for l in languages):
+        raise _bad_request("'languages' must be a non-empty list of strings")
+    # Metrics are keyed by language, so only known languages are accepted
+    unknown = [l for l in languages if l.lower() not in LANGUAGES]
+    if unknown:
+        raise _bad_request(f"Unknown language(s): {unknown}; expected one of {LANGUAGES}")
+    if not isinstance(models, list) or not models:
+        raise _bad_request("'models' must be a non-empty list of strings")
+    unknown = [m for m in models if not isinstance(m, str) or m.lower() not in MODELS]
+    if unknown:
+        raise _bad_request(f"Unknown model(s): {unknown}; expected one of {MODELS}")
+
+    params = dict(DEFAULT_PARAMS)
+    user_params = body.get("params", {})
+    if not isinstance(user_params, dict) or not set(user_params) <= set(PARAM_RANGES):
+        raise _bad_request(f"'params' may only contain {sorted(PARAM_RANGES)}")
+    for name, value in user_params.items():
+        kind, low, high = PARAM_RANGES[name]
+        # bool is an int subclass; floats also accept integral JSON numbers
+        valid_type = isinstance(value, (int, float) if kind is float else int) and not isinstance(value, bool)
+        if not valid_type or not low <= value <= high:
+            raise _bad_request(f"'params.{name}' must be {kind.__name__} in [{low}, {high}]")
+        params[name] = kind(value)
+
+    jobs = [(language.lower(), model.lower()) for language in languages for model in models]
+    return prompt, jobs, params
+
+
+async def handle_generate(request: web.Request) -> web.Response:
+    service: GenerationService = request.app["service"]
+    service.metrics.count_request("generate")
+    prompt, jobs, params = await _read_request(request, batch=False)
+    (future,) = service.submit(prompt, jobs, params)
+    try:
+        result = await future
+    finally:
+        # If the client went away, the queued job is skipped by the workers
+        future.cancel()
+    return web.json_response(result)
+
+
+async def handle_batch(request: web.Request) -> web.Response:
+    service: GenerationService = request.app["service"]
+    service.metrics.count_request("batch")
+    prompt, jobs, params = await _read_request(request, batch=True)
+    futures = service.submit(prompt, jobs, params)
+    try:
+        results = await asyncio.gather(*futures)
+    finally:
+        for future in futures:
+            future.cancel()
+    return web.json_response({"results": results})
+
+
+async def handle_stream(request: web.Request) -> web.StreamResponse:
+    service: GenerationService = request.app["service"]
+    service.metrics.count_request("stream")
+    prompt, jobs, params = await _read_request(request, batch=True)
+    futures = service.submit(prompt, jobs, params)
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+    })
+    await response.prepare(request)
+    try:
+        for next_result in asyncio.as_completed(futures):
+            result = await next_result
+            await response.write(f"event: result\ndata: {json.dumps(result, ensure_ascii=False)}\n\n".encode())
+        await response.write(b"event: done\ndata: {}\n\n")
+    finally:
+        # Cancelled futures are skipped by the workers, so a disconnected
+        # client does not keep upstream calls running for nobody.
+        for future in futures:
+            future.cancel()
+    return response
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok"})
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    service: GenerationService = request.app["service"]
+    snapshot = service.metrics.snapshot(
+        service._queue.qsize() if service._queue is not None else 0,
+        service.queue_size,
+        service.concurrency,
+    )
+    if isinstance(service.api, SharedCacheAPI):
+        snapshot["cache"] = service.api.stats
+    return web.json_response(snapshot)
+
+
+def create_app(api, concurrency: int = 8, queue_size: int = 64) -> web.Application:
+    service = GenerationService(api, concurrency=concurrency, queue_size=queue_size)
+    app = web.Application()
+    app["service"] = service
+    app.on_startup.append(service.start)
+    app.on_cleanup.append(service.stop)
+    app.add_routes([
+        web.post("/generate", handle_generate),
+        web.post("/generate/batch", handle_batch),
+        web.post("/generate/stream", handle_stream),
+        web.get("/health", handle_health),
+        web.get("/metrics", handle_metrics),
+    ])
+    return app
+
+
+def build_api(mock: bool):
+    if mock:
+        from mock_api_client import CodeGenerationAPI as MockCodeGenerationAPI
+        return MockCodeGenerationAPI()
+    import dotenv
+    from llms_api_client import CodeGenerationAPI
+    dotenv.load_dotenv()
+    return CodeGenerationAPI(api_key=os.getenv("API_KEY_HUGGINGFACE"))
+
+
+def serve(args: argparse.Namespace):
+    """Run one service instance (one worker process)."""
+    import log_config
+    log_config.setup_logging()
+    api = build_api(args.mock)
+    if args.store:
+        api = wrap_with_shared_cache(api, args.store, rate_per_s=args.rate, burst=args.burst)
+    app = create_app(api, concurrency=args.concurrency, queue_size=args.queue_size)
+    # handler_cancellation cancels handlers of disconnected clients, which
+    # cancels their queued jobs (see the finally blocks in the handlers)
+    web.run_app(app, host=args.host, port=args.port, reuse_port=args.workers > 1, handler_cancellation=True,
+                print=None if args.workers > 1 else print)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP service for multi-language code generation")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel upstream generations per worker")
+    parser.add_argument("--queue-size", type=int, default=64, help="queued generations before 503, per worker")
+    parser.add_argument("--mock", action="store_true", help="use mock_api_client instead of HuggingFace")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes sharing the port")
+    parser.add_argument("--store", default=None,
+                        help="SQLite file for the shared cache and rate limit "
+                             "(default: none for one worker, GENERATION_CACHE_PATH or a temp file for several)")
+    parser.add_argument("--rate", type=float, default=2.0, help="upstream requests/second per backend, all workers")
+    parser.add_argument("--burst", type=float, default=4.0, help="upstream burst size per backend, all workers")
+    args = parser.parse_args()
+    if args.rate <= 0 or args.burst < 1:
+        parser.error("--rate must be positive and --burst at least 1")
+
+    if args.workers <= 1:
+        serve(args)
+        return
+
+    # Without a shared store every worker would keep its own cache and budget
+    args.store = args.store or default_store_path()
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=serve, args=(args,), daemon=True) for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers, store {args.store}")
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,127 @@
 # llms_api_client.py
-from typing import List, Dict, Any, Optional
-import aiohttp
-from dataclasses import dataclass
+from __future__ import annotations
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
+import json
+import os
+import sys
+import tempfile
+import uuid
+import weakref
+
+if TYPE_CHECKING:
+    # aiohttp is only needed for annotations here; importing it eagerly costs
+    # ~100ms on every cold start of the Streamlit apps.
+    import aiohttp
+
+# What ModelResponse does with raw payloads: "drop" them, keep them in
+# "memory", or spill them to "disk" and read them back on access
+RAW_PAYLOAD_MODE = os.getenv("MODEL_RESPONSE_RAW", "drop")
+RAW_SPILL_DIR = os.getenv("MODEL_RESPONSE_SPILL_DIR") or os.path.join(tempfile.gettempdir(), "qwencoderui-raw")
+
+# Error bodies (often whole HTML pages) are cut to this length in ``error``
+ERROR_MAX_CHARS = 1000
+
 
-@dataclass
 class ModelResponse:
-    """Unified response structure for all models"""
-    generated_text: str
-    raw_response: Any
-    status: bool
-    error: Optional[str] = None
+    """Unified response structure for all models
+
+    Responses for every language/model are kept per session, so this is a
+    ``__slots__`` class rather than a dataclass. The raw payload is only kept
+    on demand (``raw_mode``), and when ``prompt`` is given and the model
+    echoed it back, only the completion is copied into the response; the
+    prompt is referenced, and ``share_prefix`` lets equal prompts of a result
+    set share one string.
+    """
+    __slots__ = ("_prefix", "_text", "_raw", "_raw_nbytes", "_raw_path", "status", "error", "cached",
+                 "__weakref__")
+
+    def __init__(self, generated_text: str, raw_response: Any, status: bool, error: Optional[str] = None,
+                 cached: bool = False, prompt: Optional[str] = None, raw_mode: Optional[str] = None):
+        self.status = status
+        self.error = error
+        self.cached = cached
+        self._set_text(generated_text, prompt)
+
+        self._raw = None
+        self._raw_nbytes = 0
+        self._raw_path = None
+        mode = raw_mode or RAW_PAYLOAD_MODE
+        if raw_response is None or mode == "drop":
+            pass
+        elif mode == "disk":
+            self._spill(raw_response)
+        else:
+            self._raw = raw_response
+            # getsizeof() is shallow (a list holding a 100 KB dict counts as
+            # ~100 bytes); the serialized payload tracks its real size
+            self._raw_nbytes = sys.getsizeof(json.dumps(raw_response, ensure_ascii=False, default=str))
+
+    def _set_text(self, text: str, prompt: Optional[str] = None):
+        if prompt and text.startswith(prompt):
+            # Not sys.intern: interned strings are immortal on Python 3.12+
+            self._prefix = prompt
+            self._text = text[len(prompt):]
+        else:
+            self._prefix = None
+            self._text = text
+
+    def _spill(self, raw_response: Any):
+        os.makedirs(RAW_SPILL_DIR, exist_ok=True)
+        path = os.path.join(RAW_SPILL_DIR, f"{uuid.uuid4().hex}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(raw_response, f, ensure_ascii=False, default=str)
+        self._raw_path = path
+        # The file lives exactly as long as the response object
+        weakref.finalize(self, _unlink_quietly, path)
+
+    @property
+    def generated_text(self) -> str:
+        return self._prefix + self._text if self._prefix is not None else self._text
+
+    @generated_text.setter
+    def generated_text(self, value: str):
+        self._set_text(value, self._prefix)
+
+    @property
+    def raw_response(self) -> Any:
+        """Raw payload, or None if it was not kept (see MODEL_RESPONSE_RAW)"""
+        if self._raw_path is not None:
+            with open(self._raw_path, encoding="utf-8") as f:
+                return json.load(f)
+        return self._raw
+
+    @property
+    def shared_prefix(self) -> Optional[str]:
+        """The echoed prompt prefix, possibly shared with other responses"""
+        return self._prefix
+
+    def share_prefix(self, prefixes: Dict[str, str]):
+        """Reuse an equal prefix already in ``prefixes``, or add ours to it."""
+        if self._prefix is not None:
+            self._prefix = prefixes.setdefault(self._prefix, self._prefix)
+
+    def nbytes(self) -> int:
+        """Approximate memory owned by this response, excluding ``shared_prefix``"""
+        size = sys.getsizeof(self._text)
+        if self.error:
+            size += sys.getsizeof(self.error)
+        return size + self._raw_nbytes
+
+    def __repr__(self) -> str:
+        return (f"ModelResponse(generated_text={self.generated_text!r}, status={self.status!r}, "
+                f"error={self.error!r}, cached={self.cached!r})")
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ModelResponse):
+            return NotImplemented
+        return (self.generated_text, self.status, self.error) == (other.generated_text, other.status, other.error)
+
+
+def _unlink_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
 
 class CodeGenerationAPI:
     """Unified API for code generation models"""
@@ -59,7 +171,8 @@ class CodeGenerationAPI:
                     return ModelResponse(
                         generated_text=text,
                         raw_response=result,
-                        status=True
+                        status=True,
+                        prompt=prompt
                     )
                 else:
                     error_text = await response.text()
@@ -67,7 +180,7 @@ class CodeGenerationAPI:
                         generated_text="",
                         raw_response=error_text,
                         status=False,
-                        error=f"API Error ({response.status}): {error_text}"
+                        error=f"API Error ({response.status}): {error_text[:ERROR_MAX_CHARS]}"
                     )
                     
         except Exception as e:
@@ -75,7 +188,7 @@ class CodeGenerationAPI:
                 generated_text="",
                 raw_response=str(e),
                 status=False,
-                error=f"Error querying {model}: {str(e)}"
+                error=f"Error querying {model}: {type(e).__name__}: {str(e)}"
             )
 
     async def generate_code_async(self, session: aiohttp.ClientSession, prompt: str, model: str = "qwen", **kwargs) -> ModelResponse:
@@ -88,4 +201,4 @@ class CodeGenerationAPI:
                 error=f"Unknown model: {model}"
             )
         
-        return await self.query_model_async(session, prompt, model.lower(), **kwargs)
\ No newline at end of file
+        return await self.query_model_async(session, prompt, model.lower(), **kwargs)
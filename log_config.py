@@ -0,0 +1,170 @@
+# log_config.py
+"""Process-wide logging: background queue handler, JSON records, sampled bodies.
+
+Callers log through the standard ``logging`` API. ``setup_logging`` routes
+every record through a ``QueueHandler`` so the request path only enqueues;
+formatting and I/O happen on a ``QueueListener`` thread.
+
+Configuration (arguments override environment variables):
+    LOG_LEVEL               root level, default INFO
+    LOG_FORMAT              "json" (default) or "text"
+    LOG_FILE                write to this file instead of stderr
+    LOG_BODY_SAMPLE_RATE    fraction of prompt/response bodies logged, default 0.01
+    LOG_BODY_MAX_CHARS      bodies are truncated to this length, default 2000
+"""
+from typing import Any, Optional
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import uuid
+
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("request_id", default=None)
+# Whether the current request's bodies are logged; decided once per request
+# so a sampled call logs its prompt and its response together
+body_sampled_var: contextvars.ContextVar = contextvars.ContextVar("body_sampled", default=None)
+
+# Attributes every LogRecord has; anything else was passed through ``extra``.
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_sampler: Optional["BodySampler"] = None
+
+
+def new_request_id() -> str:
+    """Start a new request id in the current context and return it."""
+    request_id = uuid.uuid4().hex[:16]
+    request_id_var.set(request_id)
+    body_sampled_var.set(_get_sampler().sampled())
+    return request_id
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the request id of the context they were logged from."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get()
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread.
+
+    The stock ``prepare`` merges ``msg % args`` in the logging thread, which is
+    exactly the work we want off the request path. Records never leave the
+    process, so they can be enqueued as-is.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class BodySampler:
+    """Decides which prompt/response bodies are logged, and how much of them."""
+
+    def __init__(self, rate: float, max_chars: int):
+        self.rate = max(0.0, min(1.0, rate))
+        self.max_chars = max_chars
+
+    def sampled(self) -> bool:
+        """Draw whether one request's bodies are logged."""
+        if self.rate <= 0.0:
+            return False
+        return self.rate >= 1.0 or random.random() < self.rate
+
+    def truncate(self, text: str) -> str:
+        if len(text) > self.max_chars:
+            return f"{text[:self.max_chars]}... [{len(text) - self.max_chars} chars truncated]"
+        return text
+
+
+def _sampler_from_env(rate: Optional[float] = None, max_chars: Optional[int] = None) -> BodySampler:
+    return BodySampler(
+        rate if rate is not None else float(os.getenv("LOG_BODY_SAMPLE_RATE", "0.01")),
+        max_chars if max_chars is not None else int(os.getenv("LOG_BODY_MAX_CHARS", "2000")),
+    )
+
+
+def _get_sampler() -> BodySampler:
+    global _sampler
+    if _sampler is None:
+        _sampler = _sampler_from_env()
+    return _sampler
+
+
+def setup_logging(level: Optional[str] = None, fmt: Optional[str] = None,
+                  body_sample_rate: Optional[float] = None,
+                  body_max_chars: Optional[int] = None) -> logging.handlers.QueueListener:
+    """Install the queue handler on the root logger. Safe to call repeatedly."""
+    global _listener, _sampler
+
+    _sampler = _sampler_from_env(body_sample_rate, body_max_chars)
+    root = logging.getLogger()
+    root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+    if _listener is not None:
+        return _listener
+
+    log_file = os.getenv("LOG_FILE")
+    target = logging.FileHandler(log_file, encoding="utf-8") if log_file else logging.StreamHandler()
+    if (fmt or os.getenv("LOG_FORMAT", "json")).lower() == "text":
+        target.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
+        ))
+    else:
+        target.setFormatter(JsonFormatter())
+
+    handler = DeferredQueueHandler(queue.SimpleQueue())
+    handler.addFilter(RequestIdFilter())
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+
+    _listener = logging.handlers.QueueListener(handler.queue, target, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_stop_listener)
+    return _listener
+
+
+def _stop_listener():
+    # QueueListener.stop() fails if the listener was already stopped
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def log_body(logger: logging.Logger, label: str, text: Optional[str], **fields: Any) -> None:
+    """Log a prompt/response body at DEBUG, subject to sampling and truncation.
+
+    Inside a request (see ``new_request_id``) all bodies follow that request's
+    sampling decision; outside one, each body is sampled on its own.
+    """
+    if text is None or not logger.isEnabledFor(logging.DEBUG):
+        return
+    sampler = _get_sampler()
+    sampled = body_sampled_var.get()
+    if sampled is None:
+        sampled = sampler.sampled()
+    if sampled:
+        logger.debug("%s", label, extra={"body": sampler.truncate(text), **fields})
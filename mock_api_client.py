@@ -1,20 +1,11 @@
-from dataclasses import dataclass
-from typing import Any, Optional
+import asyncio
 import logging
+import random
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger('mock_api')
+from llms_api_client import ModelResponse
 
-@dataclass
-class ModelResponse:
-    generated_text: str
-    raw_response: Any
-    status: bool
-    error: Optional[str] = None
+# Логирование настраивается один раз на процесс в log_config.setup_logging()
+logger = logging.getLogger('mock_api')
 
 MOCK_RESPONSES = {
     "python": {
@@ -262,24 +253,43 @@ Advanced features:
 }
 
 class CodeGenerationAPI:
-    """Mock API для генерации кода"""
+    """Mock API для генерации кода
+    
+    Может имитировать задержку и ошибки настоящего API для нагрузочных
+    тестов (см. replay.py): latency_s +- jitter_s секунд на запрос, доля
+    error_rate запросов завершается ошибкой 503 или 429.
+    """
     
-    def __init__(self, api_key: str = ""):
-        logger.info(f"Initializing Mock CodeGenerationAPI")
+    def __init__(self, api_key: str = "", latency_s: float = 0.0, jitter_s: float = 0.0,
+                 error_rate: float = 0.0):
+        logger.info("Initializing Mock CodeGenerationAPI")
         # Mock API не требует ключа
-        pass
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.error_rate = error_rate
     
     async def generate_code_async(self, session, prompt: str, model: str, language: str, **kwargs) -> ModelResponse:
-        logger.info(f"Generating code for language: {language}, model: {model}")
-        logger.debug(f"Additional parameters: {kwargs}")
+        logger.info("Generating code for language: %s, model: %s", language, model)
+        logger.debug("Additional parameters: %s", kwargs)
+        
+        if self.latency_s or self.jitter_s:
+            await asyncio.sleep(max(0.0, random.uniform(self.latency_s - self.jitter_s, self.latency_s + self.jitter_s)))
+        if self.error_rate and random.random() < self.error_rate:
+            status = random.choice([429, 503])
+            return ModelResponse(
+                generated_text="",
+                raw_response="Mock upstream error",
+                status=False,
+                error=f"API Error ({status}): Mock upstream error"
+            )
         
         try:
             if language.lower() not in MOCK_RESPONSES:
-                logger.error(f"Language {language} not found in mock responses")
+                logger.error("Language %s not found in mock responses", language)
                 raise KeyError(f"Language {language} not supported")
                 
             if model.lower() not in MOCK_RESPONSES[language.lower()]:
-                logger.error(f"Model {model} not found for language {language}")
+                logger.error("Model %s not found for language %s", model, language)
                 raise KeyError(f"Model {model} not supported for {language}")
             
             response_text = MOCK_RESPONSES[language.lower()][model.lower()]
@@ -291,7 +301,7 @@ class CodeGenerationAPI:
                 status=True
             )
         except KeyError as e:
-            logger.error(f"KeyError occurred: {str(e)}")
+            logger.error("KeyError occurred: %s", e)
             return ModelResponse(
                 generated_text="",
                 raw_response={},
@@ -299,10 +309,10 @@ class CodeGenerationAPI:
                 error=f"No mock response for language: {language} and model: {model}"
             )
         except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}", exc_info=True)
+            logger.error("Unexpected error: %s", e, exc_info=True)
             return ModelResponse(
                 generated_text="",
                 raw_response={},
                 status=False,
                 error=f"Error generating code: {str(e)}"
-            )
\ No newline at end of file
+            )
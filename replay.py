@@ -0,0 +1,300 @@
+# replay.py
+"""Replay recorded generation requests as open-loop load and report capacity.
+
+Input is JSON Lines. Each record needs a prompt, taken from the first of
+``prompt``, ``body`` or ``title`` (so backlog files in the ``requests.jsonl``
+format work as-is). Optional fields:
+    ts / timestamp      arrival time, epoch seconds or ISO 8601
+    language / model    replay only this pair instead of every language x model
+    params              generation parameters (max_tokens, temperature, top_p)
+
+Arrivals are scheduled up front and fired on time whether or not earlier
+requests have finished (open loop), so a slow backend shows up as growing
+latency rather than as a silently lower request rate. Records with timestamps
+keep their original spacing divided by ``--speed``; otherwise, or with
+``--rate``, arrivals are Poisson at that many requests per second.
+
+Targets:
+    default     in-process generate_code_async against the mock backend with
+                injected latency and errors (--latency, --jitter, --error-rate)
+    --live      in-process against the HuggingFace API (needs API_KEY_HUGGINGFACE)
+    --target    a running generation_service.py, over HTTP
+
+Usage:
+    python replay.py requests.jsonl --rate 20 --repeat 5
+    python replay.py history.jsonl --speed 4 --store /tmp/cache.sqlite3
+    python replay.py history.jsonl --target http://127.0.0.1:8080 --json
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from code_generation import DEFAULT_PARAMS, LANGUAGES, MODELS, generate_code_async
+
+
+class ReplayRecord:
+    """One recorded request and the language/model pairs it fans out to"""
+
+    def __init__(self, prompt: str, jobs: List[Tuple[str, str]], params: dict, ts: Optional[float]):
+        self.prompt = prompt
+        self.jobs = jobs
+        self.params = params
+        self.ts = ts
+
+
+class CallResult:
+    __slots__ = ("language", "model", "latency_ms", "ok", "error", "cached")
+
+    def __init__(self, language: str, model: str, latency_ms: float, ok: bool,
+                 error: Optional[str], cached: bool):
+        self.language = language
+        self.model = model
+        self.latency_ms = latency_ms
+        self.ok = ok
+        self.error = error
+        self.cached = cached
+
+
+def _parse_ts(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+def load_records(path: str, languages: List[str], models: List[str]) -> List[ReplayRecord]:
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            raw = json.loads(line)
+            prompt = raw.get("prompt") or raw.get("body") or raw.get("title")
+            if not prompt:
+                print(f"{path}:{line_no}: no prompt, skipped", file=sys.stderr)
+                continue
+            job_languages = [raw["language"]] if raw.get("language") else languages
+            job_models = [raw["model"]] if raw.get("model") else models
+            jobs = [(language, model) for language in job_languages for model in job_models]
+            params = dict(DEFAULT_PARAMS)
+            params.update({k: v for k, v in (raw.get("params") or {}).items() if k in DEFAULT_PARAMS})
+            records.append(ReplayRecord(prompt, jobs, params, _parse_ts(raw.get("ts", raw.get("timestamp")))))
+    return records
+
+
+def build_schedule(records: List[ReplayRecord], rate: Optional[float], speed: float,
+                   repeat: int, seed: int) -> List[Tuple[float, ReplayRecord]]:
+    """Return (offset_s, record) pairs sorted by offset."""
+    rng = random.Random(seed)
+    timed = rate is None and all(r.ts is not None for r in records)
+    schedule = []
+    offset = 0.0
+    for _ in range(repeat):
+        if timed:
+            start = min(r.ts for r in records)
+            span = (max(r.ts for r in records) - start) / speed
+            for record in records:
+                schedule.append((offset + (record.ts - start) / speed, record))
+            # Keep the mean gap between the end of one pass and the next
+            offset += span + (span / max(len(records) - 1, 1))
+        else:
+            for record in records:
+                offset += rng.expovariate(rate if rate is not None else 10.0)
+                schedule.append((offset, record))
+    schedule.sort(key=lambda item: item[0])
+    return schedule
+
+
+def error_category(error: Optional[str]) -> str:
+    match = re.search(r"Error \((\d{3})\)", error or "")
+    if match:
+        return f"http_{match.group(1)}"
+    # Client errors carry the exception type name, e.g. "...: TimeoutError: "
+    if error and "timeout" in error.lower():
+        return "timeout"
+    return "other"
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank method
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Replayer:
+    def __init__(self, api=None, client=None, max_outstanding: int = 10000):
+        self.api = api
+        self.client = client
+        self.max_outstanding = max_outstanding
+        self.results: List[CallResult] = []
+        self.dropped: Counter = Counter()
+        self.lags_ms: List[float] = []
+        self._outstanding = 0
+
+    async def _call(self, session, record: ReplayRecord, language: str, model: str):
+        start = time.perf_counter()
+        try:
+            if self.client is not None:
+                response = await self.client.generate_async(session, record.prompt, language, model, record.params)
+            else:
+                response = await generate_code_async(session, self.api, record.prompt, model, language, record.params)
+            ok, error, cached = response.status, response.error, response.cached
+        except Exception as e:
+            ok, error, cached = False, f"exception: {type(e).__name__}: {e}", False
+        self.results.append(CallResult(language, model, (time.perf_counter() - start) * 1000, ok, error, cached))
+
+    async def _fire(self, session, record: ReplayRecord):
+        self._outstanding += 1
+        try:
+            await asyncio.gather(*(self._call(session, record, language, model) for language, model in record.jobs))
+        finally:
+            self._outstanding -= 1
+
+    async def run(self, session, schedule: List[Tuple[float, ReplayRecord]]) -> float:
+        tasks = []
+        start = time.perf_counter()
+        for offset, record in schedule:
+            delay = offset - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # How late this arrival fired; large values mean the driver itself is saturated
+            self.lags_ms.append(max(0.0, time.perf_counter() - start - offset) * 1000)
+            if self._outstanding >= self.max_outstanding:
+                for language, model in record.jobs:
+                    self.dropped[f"{model}/{language}"] += 1
+                continue
+            tasks.append(asyncio.create_task(self._fire(session, record)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+    def report(self, elapsed_s: float, offered: int) -> Dict[str, Any]:
+        groups: Dict[str, List[CallResult]] = defaultdict(list)
+        for result in self.results:
+            groups[f"{result.model}/{result.language}"].append(result)
+        groups["all"] = list(self.results)
+
+        rows = {}
+        for name, results in sorted(groups.items(), key=lambda item: (item[0] == "all", item[0])):
+            latencies = sorted(r.latency_ms for r in results)
+            dropped = sum(self.dropped.values()) if name == "all" else self.dropped.get(name, 0)
+            errors = Counter(error_category(r.error) for r in results if not r.ok)
+            if dropped:
+                errors["dropped"] = dropped
+            rows[name] = {
+                "calls": len(results),
+                "ok": sum(r.ok for r in results),
+                "throughput_per_s": round(len(results) / elapsed_s, 2) if elapsed_s else 0.0,
+                "p50_ms": round(percentile(latencies, 50), 1),
+                "p90_ms": round(percentile(latencies, 90), 1),
+                "p99_ms": round(percentile(latencies, 99), 1),
+                "max_ms": round(latencies[-1], 1) if latencies else 0.0,
+                "cache_hit_rate": round(sum(r.cached for r in results) / len(results), 3) if results else 0.0,
+                "errors": dict(errors),
+            }
+        lags = sorted(self.lags_ms)
+        return {
+            "elapsed_s": round(elapsed_s, 2),
+            "requests_offered": offered,
+            "scheduler_lag_p99_ms": round(percentile(lags, 99), 1),
+            "groups": rows,
+        }
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"elapsed {report['elapsed_s']}s, {report['requests_offered']} requests offered, "
+          f"scheduler lag p99 {report['scheduler_lag_p99_ms']} ms")
+    header = f"{'model/language':<22}{'calls':>7}{'ok':>7}{'rps':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}{'hit%':>7}  errors"
+    print(header)
+    print("-" * len(header))
+    for name, row in report["groups"].items():
+        errors = ", ".join(f"{k}={v}" for k, v in sorted(row["errors"].items())) or "-"
+        print(f"{name:<22}{row['calls']:>7}{row['ok']:>7}{row['throughput_per_s']:>8}"
+              f"{row['p50_ms']:>9}{row['p90_ms']:>9}{row['p99_ms']:>9}{row['max_ms']:>9}"
+              f"{row['cache_hit_rate'] * 100:>7.1f}  {errors}")
+
+
+async def replay(args: argparse.Namespace) -> Dict[str, Any]:
+    import aiohttp
+
+    records = load_records(args.log, args.languages, args.models)
+    if not records:
+        raise SystemExit(f"No replayable records in {args.log}")
+    schedule = build_schedule(records, args.rate, args.speed, args.repeat, args.seed)
+
+    client = api = None
+    if args.target:
+        from service_client import GenerationServiceClient
+        client = GenerationServiceClient(args.target)
+    elif args.live:
+        import dotenv
+        from llms_api_client import CodeGenerationAPI
+        dotenv.load_dotenv()
+        api = CodeGenerationAPI(api_key=os.getenv("API_KEY_HUGGINGFACE"))
+    else:
+        from mock_api_client import CodeGenerationAPI as MockCodeGenerationAPI
+        api = MockCodeGenerationAPI(latency_s=args.latency, jitter_s=args.jitter, error_rate=args.error_rate)
+    if api is not None and args.store:
+        from shared_cache import wrap_with_shared_cache
+        api = wrap_with_shared_cache(api, args.store, rate_per_s=args.upstream_rate, burst=args.upstream_burst)
+
+    replayer = Replayer(api=api, client=client, max_outstanding=args.max_outstanding)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0), timeout=timeout) as session:
+        elapsed = await replayer.run(session, schedule)
+    return replayer.report(elapsed, len(schedule))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop replay of recorded generation requests")
+    parser.add_argument("log", help="JSON Lines file of recorded requests")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Poisson arrival rate, requests/s (default: recorded timestamps, else 10)")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay timestamped logs this many times faster")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the log this many times back to back")
+    parser.add_argument("--languages", nargs="+", default=LANGUAGES)
+    parser.add_argument("--models", nargs="+", default=MODELS)
+    parser.add_argument("--target", default=None, help="base URL of a running generation_service.py")
+    parser.add_argument("--live", action="store_true", help="call the HuggingFace API in-process")
+    parser.add_argument("--latency", type=float, default=1.0, help="mock backend mean latency, seconds")
+    parser.add_argument("--jitter", type=float, default=0.5, help="mock backend latency jitter, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="mock backend error fraction")
+    parser.add_argument("--store", default=None, help="use the shared cache/rate limit in this SQLite file")
+    parser.add_argument("--upstream-rate", type=float, default=1000.0,
+                        help="shared rate limit per backend with --store, requests/s")
+    parser.add_argument("--upstream-burst", type=float, default=1000.0)
+    parser.add_argument("--max-outstanding", type=int, default=10000,
+                        help="drop arrivals while this many requests are in flight")
+    parser.add_argument("--timeout", type=float, default=300.0, help="per-call HTTP timeout, seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    if args.rate is not None and args.rate <= 0:
+        parser.error("--rate must be positive")
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    if args.upstream_rate <= 0 or args.upstream_burst < 1:
+        parser.error("--upstream-rate must be positive and --upstream-burst at least 1")
+
+    report = asyncio.run(replay(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
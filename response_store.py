@@ -0,0 +1,35 @@
+# response_store.py
+from typing import Hashable, List, Optional
+import sys
+
+from llms_api_client import ModelResponse
+
+
+class SessionResults:
+    """The result set currently shown to one session.
+
+    The page only ever displays the latest submit, so storing a new result
+    set replaces the previous one and frees it. Responses in a set share
+    equal prompt prefixes (the two models of a language echo the same
+    prompt), and ``nbytes`` approximates the memory held, counting each
+    distinct prefix once.
+    """
+
+    def __init__(self):
+        self.key: Optional[Hashable] = None
+        self.current: Optional[List[ModelResponse]] = None
+        self.nbytes = 0
+
+    def put(self, key: Hashable, results: List[ModelResponse]):
+        prefixes = {}
+        for result in results:
+            result.share_prefix(prefixes)
+        self.key = key
+        self.current = results
+        self.nbytes = (sum(result.nbytes() for result in results)
+                       + sum(sys.getsizeof(prefix) for prefix in prefixes.values()))
+
+    def clear(self):
+        self.key = None
+        self.current = None
+        self.nbytes = 0
@@ -0,0 +1,63 @@
+# service_client.py
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from llms_api_client import ModelResponse
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+class GenerationServiceClient:
+    """Thin client for generation_service.py"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+
+    @staticmethod
+    def _to_response(result: Dict) -> ModelResponse:
+        return ModelResponse(
+            generated_text=result.get("generated_text", ""),
+            raw_response=None,
+            status=result.get("status", False),
+            error=result.get("error"),
+            cached=result.get("cached", False)
+        )
+
+    async def generate_async(self, session: aiohttp.ClientSession, prompt: str, language: str,
+                             model: str, params: Optional[dict] = None) -> ModelResponse:
+        """Generate code for one language/model pair"""
+        payload = {"prompt": prompt, "language": language, "model": model, "params": params or {}}
+        try:
+            async with session.post(f"{self.base_url}/generate", json=payload) as response:
+                if response.status != 200:
+                    return self._error(response.status, await response.text())
+                return self._to_response(await response.json())
+        except Exception as e:
+            return ModelResponse(generated_text="", raw_response=None, status=False,
+                                 error=f"Error querying generation service: {type(e).__name__}: {str(e)}")
+
+    async def generate_batch_async(self, session: aiohttp.ClientSession, prompt: str, languages: List[str],
+                                   models: List[str], params: Optional[dict] = None) -> List[ModelResponse]:
+        """Generate code for every language x model pair, in language-major order"""
+        payload = {"prompt": prompt, "languages": languages, "models": models, "params": params or {}}
+        try:
+            async with session.post(f"{self.base_url}/generate/batch", json=payload) as response:
+                if response.status != 200:
+                    error = self._error(response.status, await response.text())
+                    return [error] * (len(languages) * len(models))
+                results = (await response.json())["results"]
+                return [self._to_response(result) for result in results]
+        except Exception as e:
+            error = ModelResponse(generated_text="", raw_response=None, status=False,
+                                  error=f"Error querying generation service: {type(e).__name__}: {str(e)}")
+            return [error] * (len(languages) * len(models))
+
+    @staticmethod
+    def _error(status: int, text: str) -> ModelResponse:
+        return ModelResponse(
+            generated_text="",
+            raw_response=text,
+            status=False,
+            error=f"Service Error ({status}): {text}"
+        )
@@ -0,0 +1,202 @@
+# shared_cache.py
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, Dict, Optional
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+
+from llms_api_client import ModelResponse
+from shared_store import SharedStore, default_store_path
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = logging.getLogger('shared_cache')
+
+
+def cache_key(prompt: str, model: str, params: Dict[str, Any]) -> str:
+    payload = json.dumps([model, prompt, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SharedCacheAPI:
+    """CodeGenerationAPI wrapper sharing cache, in-flight calls and rate limits across workers.
+
+    Identical requests are answered from the shared cache; a request that is
+    already being generated by any worker waits for that result instead of
+    calling upstream again; every upstream call first takes a token from the
+    backend's shared bucket. Failed generations are stored for
+    ``failure_ttl_s`` so waiters get the failure instead of each retrying it;
+    successes for ``response_ttl_s`` (the store's default if None).
+    """
+
+    def __init__(self, api, store: SharedStore, rate_per_s: float = 2.0, burst: float = 4.0,
+                 backoff_s: float = 10.0, wait_timeout_s: float = 120.0, poll_interval_s: float = 0.1,
+                 failure_ttl_s: float = 5.0, response_ttl_s: Optional[float] = None):
+        if rate_per_s <= 0:
+            raise ValueError(f"rate_per_s must be positive, got {rate_per_s}")
+        if burst < 1:
+            raise ValueError(f"burst must be at least 1, got {burst}")
+        self.api = api
+        self.store = store
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self.backoff_s = backoff_s
+        self.wait_timeout_s = wait_timeout_s
+        self.poll_interval_s = poll_interval_s
+        self.failure_ttl_s = failure_ttl_s
+        self.response_ttl_s = response_ttl_s
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "rate_limited_s": 0.0}
+        # Same-process callers share one task instead of polling the store
+        self._local: Dict[str, asyncio.Future] = {}
+
+    async def generate_code_async(self, session: aiohttp.ClientSession, prompt: str, model: str = "qwen",
+                                  **kwargs) -> ModelResponse:
+        key = cache_key(prompt, model.lower(), kwargs)
+
+        loop = asyncio.get_running_loop()
+        local = self._local.get(key)
+        # Streamlit sessions each run their own event loop; only futures of
+        # the current loop can be awaited, other callers coalesce via the store.
+        if local is not None and local.get_loop() is loop:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(local)
+
+        future = loop.create_future()
+        self._local[key] = future
+        try:
+            response = await self._lookup_or_generate(key, session, prompt, model, kwargs)
+            future.set_result(response)
+            return response
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be awaiting it; don't warn about an unretrieved exception
+            future.exception()
+            raise
+        finally:
+            if self._local.get(key) is future:
+                del self._local[key]
+
+    async def _lookup_or_generate(self, key: str, session: aiohttp.ClientSession, prompt: str,
+                                  model: str, kwargs: Dict[str, Any]) -> ModelResponse:
+        deadline = time.monotonic() + self.wait_timeout_s
+        waited = False
+        while True:
+            cached = await self.store.run(self.store.get_response, key)
+            if cached is not None:
+                self.stats["coalesced" if waited else "hits"] += 1
+                return _from_record(cached, prompt)
+            if await self._claim(key):
+                break
+            if time.monotonic() > deadline:
+                # The owner is too slow or stuck; generate ourselves rather than fail
+                logger.warning("Timed out waiting for in-flight generation %s", key[:12])
+                return await self._generate(key, session, prompt, model, kwargs, claimed=False)
+            waited = True
+            await asyncio.sleep(self.poll_interval_s)
+
+        return await self._generate(key, session, prompt, model, kwargs, claimed=True)
+
+    async def take(self, prompt: str, model: str = "qwen", **kwargs) -> Optional[ModelResponse]:
+        """Consume the stored success for a request, waiting while it is in flight.
+
+        Returns None, without calling upstream, if there is no such response or
+        it failed. Each stored response is handed out at most once.
+        """
+        key = cache_key(prompt, model.lower(), kwargs)
+        deadline = time.monotonic() + self.wait_timeout_s
+        while True:
+            # Checked before the lookup: a generation that finishes in between
+            # has already stored its response, so the lookup still sees it
+            inflight = await self.store.run(self.store.is_inflight, key)
+            cached = await self.store.run(self.store.take_response, key)
+            if cached is not None:
+                if not cached.get("status", True):
+                    return None
+                self.stats["hits"] += 1
+                return _from_record(cached, prompt)
+            if not inflight or time.monotonic() > deadline:
+                return None
+            await asyncio.sleep(self.poll_interval_s)
+
+    async def _claim(self, key: str) -> bool:
+        """Claim ``key``; if cancelled before the claim lands, give it back.
+
+        The claim keeps running in the executor after the caller is cancelled
+        (speculative calls are preempted at any await). Left in place, the row
+        would make every later request for ``key`` wait for ``wait_timeout_s``.
+        """
+        outcome = concurrent.futures.Future()
+
+        def claim() -> bool:
+            try:
+                outcome.set_result(self.store.claim(key, self.owner))
+            except BaseException as e:
+                outcome.set_exception(e)
+            return outcome.result()
+
+        try:
+            return await self.store.run(claim)
+        except asyncio.CancelledError:
+            def give_back(done: concurrent.futures.Future):
+                if done.exception() is None and done.result():
+                    self.store.release(key, self.owner)
+
+            # Runs in the executor thread once the claim finishes, or right here
+            # if it already has; either way without needing the event loop
+            outcome.add_done_callback(give_back)
+            raise
+
+    async def _generate(self, key: str, session: aiohttp.ClientSession, prompt: str, model: str,
+                        kwargs: Dict[str, Any], claimed: bool) -> ModelResponse:
+        self.stats["misses"] += 1
+        backend = model.lower()
+        try:
+            wait = await self.store.run(self.store.reserve_token, backend, self.rate_per_s, self.burst)
+            if wait > 0:
+                self.stats["rate_limited_s"] += wait
+                await asyncio.sleep(wait)
+
+            response = await self.api.generate_code_async(session, prompt, model=model, **kwargs)
+            if response.status:
+                await self.store.run(self.store.put_response, key, {"generated_text": response.generated_text},
+                                     self.response_ttl_s)
+            else:
+                # Publish the failure briefly: waiters on other workers return it
+                # instead of each claiming the key and calling upstream again
+                await self.store.run(self.store.put_response, key, {
+                    "generated_text": "", "status": False, "error": response.error
+                }, self.failure_ttl_s)
+                if response.error and "(429)" in response.error:
+                    logger.warning("Backend %s is rate limiting us, backing off %.0fs", backend, self.backoff_s)
+                    await self.store.run(self.store.penalize, backend, self.rate_per_s, self.backoff_s)
+            return response
+        finally:
+            if claimed:
+                # run_in_executor submits the release at once, so it still
+                # happens if this await is cancelled too
+                await self.store.run(self.store.release, key, self.owner)
+
+
+def _from_record(record: Dict[str, Any], prompt: str) -> ModelResponse:
+    return ModelResponse(
+        generated_text=record["generated_text"],
+        raw_response=None,
+        status=record.get("status", True),
+        error=record.get("error"),
+        cached=True,
+        prompt=prompt
+    )
+
+
+def wrap_with_shared_cache(api, path: Optional[str] = None, **kwargs) -> SharedCacheAPI:
+    return SharedCacheAPI(api, SharedStore(path or default_store_path()), **kwargs)
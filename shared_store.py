@@ -0,0 +1,176 @@
+# shared_store.py
+"""SQLite (WAL) store shared by every worker process on a host.
+
+Holds three tables:
+    responses   cached generations keyed by request hash (failures briefly)
+    inflight    which worker is currently generating a key (coalescing)
+    rate_limit  one token bucket per backend model
+
+WAL mode lets readers proceed while a writer commits, and every
+read-modify-write runs inside ``BEGIN IMMEDIATE`` so concurrent processes
+serialize on the bucket and in-flight rows instead of racing.
+"""
+from typing import Any, Dict, Optional
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS inflight (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rate_limit (
+    backend TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class SharedStore:
+    """Response cache, in-flight table and rate-limit buckets in one SQLite file"""
+
+    def __init__(self, path: str, response_ttl: float = 3600.0, inflight_ttl: float = 120.0):
+        self.path = path
+        self.response_ttl = response_ttl
+        # A worker that dies mid-generation leaves its in-flight row behind;
+        # after this long another worker may take the key over.
+        self.inflight_ttl = inflight_ttl
+        self._local = threading.local()
+        self._puts = 0
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # Responses
+
+    def get_response(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT value FROM responses WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_response(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), now + (self.response_ttl if ttl is None else ttl))
+        )
+        self._puts += 1
+        if self._puts % 100 == 0:
+            conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+
+    def take_response(self, key: str) -> Optional[Dict[str, Any]]:
+        """Remove and return a live response, so it is served at most once."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value FROM responses WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return json.loads(row[0]) if row else None
+
+    # In-flight coalescing
+
+    def claim(self, key: str, owner: str) -> bool:
+        """Mark ``key`` as being generated by ``owner``; False if someone else holds it."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM inflight WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO inflight (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, owner, now + self.inflight_ttl)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+    def release(self, key: str, owner: str):
+        self._connect().execute("DELETE FROM inflight WHERE key = ? AND owner = ?", (key, owner))
+
+    def is_inflight(self, key: str) -> bool:
+        row = self._connect().execute(
+            "SELECT 1 FROM inflight WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    # Rate limiting
+
+    def reserve_token(self, backend: str, rate: float, burst: float) -> float:
+        """Take one token from ``backend``'s bucket; return seconds to wait before using it.
+
+        The bucket may go negative: every caller gets a slot in line and waits
+        for it, so N workers together never exceed ``rate`` requests/second.
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_limit WHERE backend = ?", (backend,)
+            ).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            tokens -= 1.0
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limit (backend, tokens, updated_at) VALUES (?, ?, ?)",
+                (backend, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return 0.0 if tokens >= 0 else -tokens / rate
+
+    def penalize(self, backend: str, rate: float, seconds: float):
+        """Drain ``backend``'s bucket so that all workers back off for ``seconds``."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens FROM rate_limit WHERE backend = ?", (backend,)).fetchone()
+            tokens = min(row[0] if row else 0.0, -seconds * rate)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limit (backend, tokens, updated_at) VALUES (?, ?, ?)",
+                (backend, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def run(self, method, *args):
+        """Run a store method off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+
+
+def default_store_path() -> str:
+    import tempfile
+    return os.getenv("GENERATION_CACHE_PATH") or os.path.join(tempfile.gettempdir(), "qwencoderui-cache.sqlite3")
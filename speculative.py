@@ -0,0 +1,173 @@
+# speculative.py
+"""Speculative pre-generation while the user is still editing the prompt.
+
+As soon as a session commits a new prompt (the prompt field loses focus or
+Ctrl+Enter is pressed), the likeliest configuration (the session's current parameters, primary model, every
+language) is generated in the background into short-lived entries of the
+shared response cache. Real requests go through ``foreground_api``: a
+matching submit takes the speculative result, or waits for the speculative
+call still in flight. Each result is taken once, so submitting again samples
+a new answer, and speculative failures are never shown; the real request
+retries them itself.
+
+Speculative work is strictly lower priority than real requests. It does
+not start while a real request is running. When a real request needs
+concurrency held by speculative calls, those calls are cancelled.
+"""
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+from contextlib import contextmanager
+import asyncio
+import concurrent.futures
+import logging
+import threading
+
+from code_generation import LANGUAGES, generate_code_async, request_key
+from llms_api_client import ModelResponse
+from shared_cache import SharedCacheAPI
+
+logger = logging.getLogger('speculative')
+
+
+class ConcurrencyBudget:
+    """Upstream concurrency shared by real and speculative generations in one process"""
+
+    def __init__(self, limit: int = 8):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._foreground = 0
+        # token -> (request key, cancel callback), oldest first
+        self._background: Dict[int, Tuple[Hashable, Callable[[], None]]] = {}
+        self._next_token = 0
+
+    @contextmanager
+    def foreground(self, slots: int = 1, keep_key: Optional[Hashable] = None):
+        """Hold ``slots`` for a real request, preempting speculative calls if needed.
+
+        Speculative calls for ``keep_key`` are never preempted: the real
+        request is about to wait for exactly their results.
+        """
+        with self._lock:
+            self._foreground += slots
+            excess = self._foreground + len(self._background) - self.limit
+            victims = []
+            for token, (key, cancel) in reversed(list(self._background.items())):
+                if excess <= 0:
+                    break
+                if key != keep_key:
+                    victims.append(cancel)
+                    del self._background[token]
+                    excess -= 1
+        for cancel in victims:
+            cancel()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._foreground -= slots
+
+    def try_background(self, key: Hashable, cancel: Callable[[], None]) -> Optional[int]:
+        """Take a slot for a speculative call, or None if real work needs it."""
+        with self._lock:
+            if self._foreground or len(self._background) >= self.limit:
+                return None
+            token = self._next_token
+            self._next_token += 1
+            self._background[token] = (key, cancel)
+            return token
+
+    def release_background(self, token: int):
+        with self._lock:
+            self._background.pop(token, None)
+
+
+class PrefetchedAPI:
+    """Real-request API that first takes a matching speculative result"""
+
+    def __init__(self, api, speculative: SharedCacheAPI, model: str):
+        self.api = api
+        self.speculative = speculative
+        self.model = model
+
+    async def generate_code_async(self, session, prompt: str, model: str = "qwen", **kwargs) -> ModelResponse:
+        if model == self.model:
+            response = await self.speculative.take(prompt, model, **kwargs)
+            if response is not None:
+                return response
+        return await self.api.generate_code_async(session, prompt, model=model, **kwargs)
+
+
+class SpeculativeGenerator:
+    """Background generation on a dedicated event loop thread
+
+    ``api`` should store results only briefly (``response_ttl_s``): they
+    exist for the next submit and are consumed by it.
+    """
+
+    def __init__(self, api: SharedCacheAPI, budget: ConcurrencyBudget, model: str = "qwen",
+                 languages: Optional[List[str]] = None):
+        self.api = api
+        self.budget = budget
+        self.model = model
+        self.languages = languages or LANGUAGES
+        self._lock = threading.Lock()
+        # session id -> (request key, job)
+        self._jobs: Dict[str, Tuple[Hashable, concurrent.futures.Future]] = {}
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="speculative-generation", daemon=True).start()
+
+    def schedule(self, session_id: str, prompt: str, params: dict):
+        """Start generating a session's new prompt, cancelling its previous one."""
+        key = request_key(prompt, params)
+        with self._lock:
+            current = self._jobs.get(session_id)
+            if current is not None:
+                if current[0] == key and not current[1].cancelled():
+                    return
+                current[1].cancel()
+            job = asyncio.run_coroutine_threadsafe(self._run(key, prompt, dict(params)), self._loop)
+            self._jobs[session_id] = (key, job)
+        # Outside the lock: the callback runs right away if the job already ended
+        job.add_done_callback(lambda _: self._forget(session_id, job))
+
+    def _forget(self, session_id: str, job: concurrent.futures.Future):
+        """Drop a finished job so sessions that never submit don't accumulate."""
+        with self._lock:
+            current = self._jobs.get(session_id)
+            if current is not None and current[1] is job:
+                del self._jobs[session_id]
+
+    def foreground_api(self, api) -> PrefetchedAPI:
+        """Wrap ``api`` for real requests so they use speculative results."""
+        return PrefetchedAPI(api, self.api, self.model)
+
+    def settle(self, session_id: str, keep_key: Hashable):
+        """On submit: drop the session's speculation unless it is for ``keep_key``."""
+        with self._lock:
+            current = self._jobs.pop(session_id, None)
+        if current is not None and current[0] != keep_key:
+            current[1].cancel()
+
+    async def _run(self, key: Hashable, prompt: str, params: dict):
+        import aiohttp
+        async with aiohttp.ClientSession() as session:
+            results = await asyncio.gather(
+                *(self._generate(session, key, prompt, language, params) for language in self.languages),
+                return_exceptions=True
+            )
+        logger.info("Speculative generation finished: %d/%d generated", sum(r is True for r in results),
+                    len(results))
+
+    async def _generate(self, session, key: Hashable, prompt: str, language: str, params: dict) -> bool:
+        task = asyncio.current_task()
+        token = self.budget.try_background(key, lambda: self._loop.call_soon_threadsafe(task.cancel))
+        if token is None:
+            logger.debug("Speculative generation skipped for %s: budget is in use", language)
+            return False
+        try:
+            response = await generate_code_async(session, self.api, prompt, self.model, language, params)
+            return response.status
+        except asyncio.CancelledError:
+            logger.debug("Speculative generation for %s preempted", language)
+            return False
+        finally:
+            self.budget.release_background(token)
@@ -0,0 +1,126 @@
+# startup_profile.py
+"""Measure cold-import and rerun latency of the Streamlit entry points.
+
+Usage:
+    python startup_profile.py                      # app.py and ast_interface.py
+    python startup_profile.py app --reruns 20 --import-budget-ms 1500
+
+Import time is taken from ``python -X importtime`` in a fresh interpreter, so
+every run is a true cold start. Rerun time is measured with Streamlit's
+``AppTest`` harness, which executes the script the same way ``streamlit run``
+does on every widget interaction. Exits with status 1 if a budget is exceeded,
+so it can be wired into CI to catch regressions.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_MODULES = ["app", "ast_interface"]
+
+
+def parse_importtime(stderr: str) -> List[Tuple[int, int, int, str]]:
+    """Parse ``-X importtime`` output into (self_us, cumulative_us, depth, name)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((int(parts[0]), int(parts[1]), depth, name.strip()))
+    return rows
+
+
+def measure_import(module: str) -> Tuple[float, List[Tuple[int, str]]]:
+    """Import ``module`` in a fresh interpreter; return total ms and its heaviest direct imports."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        tail = proc.stderr.strip().splitlines()[-1:] or ["unknown error"]
+        raise RuntimeError(f"import {module} failed: {tail[0]}")
+
+    rows = parse_importtime(proc.stderr)
+    # Everything imported on behalf of the module is reported before it, one
+    # level deeper; the module itself is the last top-level entry.
+    end = max(i for i, (_, _, depth, name) in enumerate(rows) if depth == 0 and name == module)
+    start = end
+    while start > 0 and rows[start - 1][2] > 0:
+        start -= 1
+    children = sorted(((cum, name) for _, cum, depth, name in rows[start:end] if depth == 1), reverse=True)
+    total_us = rows[end][1]
+    return total_us / 1000, children
+
+
+def measure_reruns(script: Path, reruns: int) -> Optional[Dict[str, float]]:
+    """Time repeated script executions through Streamlit's AppTest harness."""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return None
+
+    at = AppTest.from_file(str(script), default_timeout=60)
+    start = time.perf_counter()
+    at.run()
+    first_ms = (time.perf_counter() - start) * 1000
+
+    samples = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "first_ms": first_ms,
+        "median_ms": statistics.median(samples),
+        "max_ms": max(samples),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES,
+                        help="entry point modules to profile (default: app ast_interface)")
+    parser.add_argument("--top", type=int, default=8, help="heaviest direct imports to show")
+    parser.add_argument("--reruns", type=int, default=10, help="reruns to time per script")
+    parser.add_argument("--import-budget-ms", type=float, default=None,
+                        help="fail if a cold import takes longer than this")
+    parser.add_argument("--rerun-budget-ms", type=float, default=None,
+                        help="fail if the median rerun takes longer than this")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        print(f"== {module}")
+        total_ms, children = measure_import(module)
+        print(f"cold import: {total_ms:.1f} ms")
+        for cum_us, name in children[:args.top]:
+            print(f"  {cum_us / 1000:8.1f} ms  {name}")
+        if args.import_budget_ms is not None and total_ms > args.import_budget_ms:
+            print(f"  !! over import budget ({args.import_budget_ms:.0f} ms)")
+            failed = True
+
+        rerun = measure_reruns(ROOT / f"{module}.py", args.reruns)
+        if rerun is None:
+            print("rerun: skipped (streamlit.testing is not available)")
+            continue
+        print(f"rerun: first {rerun['first_ms']:.1f} ms, "
+              f"median {rerun['median_ms']:.1f} ms, max {rerun['max_ms']:.1f} ms")
+        if args.rerun_budget_ms is not None and rerun["median_ms"] > args.rerun_budget_ms:
+            print(f"  !! over rerun budget ({args.rerun_budget_ms:.0f} ms)")
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())